@@ -3,7 +3,8 @@
 import sys
 import logging
 
-__all__ = ['LOG_LVLMAP', 'LOG_FMT', 'DATE_FMT', 'POSIX', '__version__', '__description__']
+__all__ = ['LOG_LVLMAP', 'LOG_FMT', 'DATE_FMT', 'DATA_FILE', 'POSIX', '__version__',
+           '__description__']
 
 __version__ = '0.6.0'
 __description__ = "Advanced Technology Gravity Meter - Serial Data Logger"
@@ -19,9 +20,36 @@ LOG_FMT = "%(levelname)8s::%(asctime)s - (%(funcName)s) %(message)s"
 TRACE_LOG_FMT = "%(levelname)8s::%(asctime)s - (%(name)s/%(funcName)s:%(lineno)d " \
                 "- thread: %(threadName)s) %(message)s"
 DATE_FMT = "%Y-%m-%d::%H:%M:%S"
+DATA_FILE = 'gravdata.dat'  # Name of the gravity data file within logdir
+
+
+class CachedTimeFormatter(logging.Formatter):
+    """
+    logging.Formatter which caches the formatted time of the last record.
+
+    DATE_FMT has a resolution of one second, so records created within the
+    same second share the result of a single time.strftime call.
+    Without a datefmt the formatted time includes milliseconds, and is not
+    cached.
+
+    """
+    _cached = (None, None, None)
+
+    def formatTime(self, record, datefmt=None):
+        if datefmt is None:
+            return super().formatTime(record, datefmt)
+        second = int(record.created)
+        # Tuple is swapped as a whole so concurrent handlers can't mix fields
+        c_second, c_datefmt, c_time = self._cached
+        if second == c_second and datefmt == c_datefmt:
+            return c_time
+        formatted = super().formatTime(record, datefmt)
+        self._cached = second, datefmt, formatted
+        return formatted
+
+
 _stderr_hdlr = logging.StreamHandler(sys.stderr)
-_stderr_hdlr.setFormatter(logging.Formatter(LOG_FMT,
-                                            datefmt=DATE_FMT))
+_stderr_hdlr.setFormatter(CachedTimeFormatter(LOG_FMT, datefmt=DATE_FMT))
 APPLOG.addHandler(_stderr_hdlr)
 
 if sys.platform.lower().startswith('linux'):
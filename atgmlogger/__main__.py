@@ -6,7 +6,7 @@ import logging
 import sys
 from pathlib import Path
 
-from . import __description__, __version__, LOG_LVLMAP
+from . import __description__, __version__, LOG_LVLMAP, DATA_FILE
 
 LOG = logging.getLogger('atgmlogger')
 
@@ -64,8 +64,8 @@ def initialize(args):
         rcParams['serial.port'] = args.device
     if args.logdir:
         rcParams['logging.logdir'] = args.logdir
-        LOG.info("Updated logging directories, new datafile path: %s",
-                 rcParams['logging.handlers.data_hdlr.filename'])
+        LOG.info("Updated logging directory, new datafile path: %s",
+                 str(Path(args.logdir).joinpath(DATA_FILE)))
     if args.mountdir:
         rcParams['usb.mount'] = args.mountdir
 
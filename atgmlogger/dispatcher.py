@@ -6,7 +6,7 @@ import logging
 import threading
 from weakref import WeakSet
 
-from .plugins import PluginInterface, PluginDaemon
+from .plugins import PluginInterface, PluginDaemon, JOIN_TIMEOUT
 
 LOG = logging.getLogger(__name__)
 POLL_INTV = 1
@@ -23,7 +23,7 @@ class Dispatcher(threading.Thread):
         cls.acquire_lock()
         assert klass is not None
         if issubclass(klass, PluginInterface) and klass not in cls._listeners:
-            LOG.debug("Registering class {} in dispatcher.".format(klass))
+            LOG.debug("Registering class %s in dispatcher.", klass)
             cls._listeners.add(klass)
             cls._params[klass] = params
         elif issubclass(klass, PluginDaemon) and klass not in cls._daemons:
@@ -88,6 +88,8 @@ class Dispatcher(threading.Thread):
         LOG.debug("Dispatcher run acquired runlock")
 
         # Create perpetual listener threads
+        # Instances are held by self._threads, so the routing map can hold
+        # plain lists (WeakSet iteration is comparatively costly per item)
         listener_map = {}
         for listener in self._listeners:
             try:
@@ -100,8 +102,7 @@ class Dispatcher(threading.Thread):
             else:
                 ctypes = instance.consumer_type()
                 for ctype in ctypes:
-                    consumer_set = listener_map.setdefault(ctype, WeakSet())
-                    consumer_set.add(instance)
+                    listener_map.setdefault(ctype, []).append(instance)
 
                 instance.start()
                 self._threads.add(instance)
@@ -114,7 +115,7 @@ class Dispatcher(threading.Thread):
             except queue.Empty:
                 item = None
             else:
-                for subscriber in listener_map.get(type(item), set()):
+                for subscriber in listener_map.get(type(item), ()):
                     subscriber.put(item)
                 self._queue.task_done()
 
@@ -128,8 +129,12 @@ class Dispatcher(threading.Thread):
                     except TypeError:
                         LOG.exception("Type error when instantiating "
                                       "daemon: %s", str(daemon))
-            # Prune finished daemon threads from the dict
-            daemons = {k: v for k, v in daemons.items() if v.is_alive()}
+            # Prune finished daemon threads from the dict (in place, and only
+            # when any are running)
+            if daemons:
+                for daemon in [k for k, v in daemons.items()
+                               if not v.is_alive()]:
+                    del daemons[daemon]
 
         self.release_lock()
 
@@ -148,7 +153,10 @@ class Dispatcher(threading.Thread):
             self._queue.put(None)
         self._exit_threads(join=join)
         if join:
-            self.join()
+            self.join(timeout=JOIN_TIMEOUT)
+            if self.is_alive():
+                LOG.warning("Dispatcher did not exit within %d seconds.",
+                            JOIN_TIMEOUT)
 
     def get_instance_of(self, klass):
         for obj in self._threads:
@@ -1,80 +1,182 @@
 # -*- coding: utf-8 -*-
 # This file is part of ATGMLogger https://github.com/DynamicGravitySystems/atgmlogger
 
-import io
+import os
+import time
+import queue
 import logging
 from pathlib import Path
 
 from .plugins import PluginInterface
 from .dispatcher import Command
+from . import DATA_FILE
 
 __all__ = ['DataLogger']
 LOG = logging.getLogger(__name__)
+FLUSH_INTV = 1.0  # Interval (seconds) between flushes of buffered data
+FLUSH_SIZE = 128 * 1024  # Buffered bytes at which data is flushed immediately
+MAX_BUFFER = 4 * FLUSH_SIZE  # Max bytes retained in the buffer if writes fail
+BLINK_INTV = 0.2  # Min interval (seconds) between data LED blink requests
 
 
 class DataLogger(PluginInterface):
-    options = ['logfile']
+    """
+    Write received data lines to the gravity data file.
+
+    Lines are accumulated (utf-8 encoded) in an in-memory buffer which is
+    written to the file with a single os.write call, rather than issuing a
+    write/flush syscall pair for each (~80 byte) line.
+    The buffer is written once it reaches FLUSH_SIZE bytes, or while data is
+    arriving, once `flush_interval` has elapsed since the last flush; if data
+    stops, the remaining buffer is flushed when the queue read times out, so
+    buffered data may take up to ~2x `flush_interval` to reach the disk.
+    While the buffer is empty the thread blocks without a timeout, so an idle
+    logger does not wake periodically.
+    If the file cannot be opened or written the data is retained in the
+    buffer, up to MAX_BUFFER bytes, beyond which the oldest lines are
+    discarded; writes are then only retried every `flush_interval`.
+
+    The data file is opened in append mode, existing data is never
+    truncated. The file is opened lazily, when buffered data is first
+    flushed, so no (empty) file is created until data is received.
+
+    A data LED blink is requested for received lines at most once every
+    BLINK_INTV seconds, so the blink requests do not back up the GPIO
+    plugin at high data rates.
+
+    """
+    options = ['logfile', 'flush_interval']
 
     def __init__(self):
         super().__init__()
-        self.logfile = Path('gravdata.dat')
-        self._hdl = None  # type: io.TextIOBase
-        self._params = dict(mode='w+', buffering=1, encoding='utf-8',
-                            newline='\n')
+        self.logfile = Path(DATA_FILE)
+        self.flush_interval = FLUSH_INTV
+        self._fd = None  # type: int
+        self._buffer = bytearray()
+        self._last_flush = 0
+        self._last_blink = 0
+        self._dropping = False
+        self._write_failed = False
 
     @staticmethod
     def consumer_type():
         return {str, Command}
 
     def _get_fhandle(self):
-        self._hdl = self.logfile.open(**self._params)
+        self._fd = os.open(str(self.logfile),
+                           os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+
+    def _close_fhandle(self):
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            os.close(fd)
+
+    def write(self, line: str):
+        self._buffer += line.encode('utf-8')
+        self._buffer += b'\n'
+        if len(self._buffer) > MAX_BUFFER:
+            self._drop_oldest()
+        if len(self._buffer) >= FLUSH_SIZE and not self._write_failed:
+            self.flush()
+
+    def _drop_oldest(self):
+        """Discard the oldest (whole) lines from the buffer to bring it within
+        MAX_BUFFER bytes. A warning is logged once until data is written."""
+        excess = len(self._buffer) - MAX_BUFFER
+        del self._buffer[:self._buffer.find(b'\n', excess - 1) + 1]
+        if not self._dropping:
+            self._dropping = True
+            LOG.warning("Data file is not writable, discarding oldest "
+                        "buffered data beyond %d bytes.", MAX_BUFFER)
+
+    def _write_error(self):
+        """Log a failure to write the data file, once until a write
+        succeeds."""
+        if not self._write_failed:
+            self._write_failed = True
+            if self._fd is None:
+                LOG.exception("Error opening file for writing.")
+            else:
+                LOG.exception("IOError encountered writing data file.")
+
+    def flush(self):
+        """Write any buffered data to the data file. Data which could not be
+        written (e.g. due to an IOError) is retained in the buffer."""
+        self._last_flush = time.monotonic()
+        if not self._buffer:
+            return
+        if self._fd is None:
+            self._get_fhandle()
+        view = memoryview(self._buffer)
+        written = 0
+        try:
+            while written < len(view):
+                written += os.write(self._fd, view[written:])
+        finally:
+            view.release()
+            del self._buffer[:written]
+        self._dropping = False
+        self._write_failed = False
 
     def log_rotate(self):
         """
         Call this to notify the logger that logs may have been rotated by the
         system.
-        Flush, close then reopen the handle.
+        Flush and close the handle, it is re-opened on the next flush.
 
         """
         LOG.info("LogRotate signal received, re-opening log handle.")
-        if self._hdl is None:
+        if self._fd is None:
             return
 
         try:
-            self._hdl.flush()
-            self._hdl.close()
-            self._hdl = None
+            self.flush()
+            self._close_fhandle()
         except IOError:
             LOG.exception("IOError encountered rotating log file.")
             return
 
-        self._get_fhandle()
-        LOG.debug("LogRotate completed without exception, handle opened "
-                  "on path %s", self._hdl.name)
+        LOG.debug("LogRotate completed without exception, handle will be "
+                  "re-opened on path %s", str(self.logfile))
 
     def run(self):
-        try:
-            self._get_fhandle()
-        except IOError:
-            LOG.exception("Error opening file for writing.")
-            return
-
+        self._last_flush = time.monotonic()
         while not self.exiting:
+            # Only time out while there is buffered data to flush; when idle
+            # block until data arrives (exit() wakes the thread with None)
+            timeout = self.flush_interval if self._buffer else None
+            try:
+                item = self.get(block=True, timeout=timeout)
+            except queue.Empty:
+                try:
+                    self.flush()
+                except IOError:
+                    self._write_error()
+                continue
+
             try:
-                item = self.get(block=True, timeout=None)
-                if item is None:
-                    self.queue.task_done()
-                    continue
+                # Single clock read per item for the blink and flush checks
+                now = time.monotonic()
                 if isinstance(item, Command):
                     if item.cmd == 'rotate':
                         self.log_rotate()
-                else:
-                    self._hdl.write(item + '\n')
-                    self.context.blink()
-                    self.queue.task_done()
+                elif item is not None:
+                    self.write(item)
+                    if now - self._last_blink >= BLINK_INTV:
+                        self._last_blink = now
+                        self.context.blink()
+                if now - self._last_flush >= self.flush_interval:
+                    self.flush()
             except IOError:
-                continue
-        self._hdl.close()
+                self._write_error()
+            finally:
+                self.task_done()
+
+        try:
+            self.flush()
+        except IOError:
+            LOG.exception("IOError encountered writing data file.")
+        self._close_fhandle()
 
     def configure(self, **options):
         super().configure(**options)
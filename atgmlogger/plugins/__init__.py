@@ -2,6 +2,7 @@
 # This file is part of ATGMLogger https://github.com/bradyzp/atgmlogger
 
 import abc
+import time
 import queue
 import logging
 import threading
@@ -9,6 +10,7 @@ from importlib import import_module
 
 __all__ = ['PluginInterface', 'PluginDaemon', 'load_plugin']
 LOG = logging.getLogger(__name__)
+JOIN_TIMEOUT = 5  # Max seconds to wait for a plugin thread to exit
 
 
 class PluginInterface(threading.Thread, metaclass=abc.ABCMeta):
@@ -47,8 +49,8 @@ class PluginInterface(threading.Thread, metaclass=abc.ABCMeta):
         return self._context
 
     def configure(self, **options):
-        LOG.debug("Configuring Plugin: {} with options: {}".format(
-            self.__class__.__name__, options))
+        LOG.debug("Configuring Plugin: %s with options: %s",
+                  self.__class__.__name__, options)
         for key, value in options.items():
             lkey = str(key).lower()
             if lkey in self.options:
@@ -61,12 +63,32 @@ class PluginInterface(threading.Thread, metaclass=abc.ABCMeta):
         self._configured = True
 
     def exit(self, join=False):
-        if join:
-            self.queue.join()
+        """Signal the plugin thread to exit, and wait (up to JOIN_TIMEOUT
+        seconds) for it to finish. If join is True, first wait (also up to
+        JOIN_TIMEOUT seconds) for the items already queued to be processed."""
+        if join and not self._join_queue(JOIN_TIMEOUT):
+            LOG.warning("Plugin %s did not process its queue within %d "
+                        "seconds.", self.name, JOIN_TIMEOUT)
         self._exitSig.set()
         if self.is_alive():
             self.queue.put(None)
-            self.join()
+            self.join(timeout=JOIN_TIMEOUT)
+            if self.is_alive():
+                LOG.warning("Plugin thread %s did not exit within %d "
+                            "seconds.", self.name, JOIN_TIMEOUT)
+
+    def _join_queue(self, timeout):
+        """Queue.join with a timeout. Returns False if tasks are still
+        unfinished after timeout seconds."""
+        q = self.queue
+        deadline = time.monotonic() + timeout
+        with q.all_tasks_done:
+            while q.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                q.all_tasks_done.wait(remaining)
+        return True
 
     def put(self, item):
         try:
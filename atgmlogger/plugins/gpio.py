@@ -2,12 +2,12 @@
 
 import logging
 import threading
-import time
 
 from . import PluginInterface
 from ..dispatcher import Blink
 
 LOG = logging.getLogger(__name__)
+MAX_PENDING = 20  # Max queued (single) blinks, further blinks are dropped
 
 
 try:
@@ -44,10 +44,6 @@ class _BlinkUntil(threading.Thread):
                 self._delegate(self._blink)
 
 
-# TODO: Consider limiting queue size, or inferring elsewhere the data rate
-# Limiting the queue might cause continuous blinks to be ignored if put with
-# nowait - this does cause random behavior where the continuous start signal
-# might be received but not the stop
 class GPIOListener(PluginInterface):
     options = ['mode', 'data_pin', 'usb_pin', 'freq']
 
@@ -61,14 +57,27 @@ class GPIOListener(PluginInterface):
         self.data_pin = 11
         self.usb_pin = 13
         self.freq = 0.04
-
-        self._blink_until_sig = threading.Event()
-        # self.queue = queue.Queue(maxsize=20)
+        self._pins = {}  # Map of LED name/pin number to configured output pin
 
     @staticmethod
     def consumer_type():
         return {Blink}
 
+    def put(self, item):
+        """Queue a Blink for processing.
+
+        A data blink is requested for every line received, and each blink
+        takes 2 * freq seconds, so at high data rates blinks would otherwise
+        accumulate in the queue without bound. Single blinks are dropped
+        once MAX_PENDING are queued; continuous (start/stop) blinks are
+        always queued so that a stop signal is never lost.
+
+        """
+        if item is not None and not item.until_stopped and \
+                self.queue.qsize() >= MAX_PENDING:
+            return
+        super().put(item)
+
     def configure(self, **options):
         super().configure(**options)
         _mode = self.modes[getattr(self, 'mode', 'board')]
@@ -79,6 +88,7 @@ class GPIOListener(PluginInterface):
                         if hasattr(self, pin)]
         for pin in self.outputs:
             gpio.setup(pin, gpio.OUT)
+        self._pins = {pin: pin for pin in self.outputs}
 
     def _get_pin(self, name: str) -> int:
         if name.lower().startswith('data'):
@@ -86,22 +96,29 @@ class GPIOListener(PluginInterface):
         elif name.lower().startswith('usb'):
             return self.usb_pin
 
-    def _blink(self, blink):
-        if isinstance(blink.led, str):
-            led_id = self._get_pin(blink.led)
-        else:
-            led_id = blink.led
-        if led_id not in self.outputs:
-            return
+    def _blink(self, blink, stop_sig=None):
+        """Blink the LED specified by blink once. The on/off delays wait on
+        stop_sig (default: the plugin exit signal) so that a blink in
+        progress is interrupted immediately when the signal is set."""
+        try:
+            led_id = self._pins[blink.led]
+        except KeyError:
+            # Resolve and cache the pin for an LED name on first use
+            led_id = self._get_pin(blink.led) if isinstance(blink.led, str) \
+                else None
+            if led_id not in self.outputs:
+                return
+            self._pins[blink.led] = led_id
+        wait = (stop_sig or self._exitSig).wait
         if HAVE_GPIO:
             gpio.output(led_id, True)
-            time.sleep(self.freq)
+            wait(self.freq)
             gpio.output(led_id, False)
-            time.sleep(self.freq)
+            wait(self.freq)
 
-    def _blink_until_stopped(self, blink):
-        while not self._blink_until_sig.is_set():
-            self._blink(blink)
+    def _blink_until_stopped(self, blink, stop_sig):
+        while not (stop_sig.is_set() or self.exiting):
+            self._blink(blink, stop_sig=stop_sig)
 
     def run(self):
         # TODO: How to trigger constant blink until stopped, while allowing
@@ -121,24 +138,30 @@ class GPIOListener(PluginInterface):
                 self.task_done()
                 continue
             elif blink.until_stopped:
+                # Each continuous blink has its own stop signal, so stopping
+                # one LED does not interrupt (or race with) another
                 if blink.led in subthreads:
                     # then stop the continuous blink
-                    self._blink_until_sig.set()
-                    thread = subthreads[blink.led]
-                    thread.join()
-                    del subthreads[blink.led]
-                    self._blink_until_sig.clear()
+                    worker, stop_sig = subthreads.pop(blink.led)
+                    stop_sig.set()
+                    worker.join()
                 else:
                     # start a new continuous blink
+                    stop_sig = threading.Event()
                     worker = threading.Thread(target=self._blink_until_stopped,
-                                              args=[blink])
+                                              args=[blink, stop_sig],
+                                              daemon=True)
                     worker.start()
-                    subthreads[blink.led] = worker
-                    del worker
+                    subthreads[blink.led] = worker, stop_sig
+                self.task_done()
             else:
                 self._blink(blink)
                 self.task_done()
 
-        for pin in self.outputs:
-            gpio.output(pin, False)
+        for worker, stop_sig in subthreads.values():
+            stop_sig.set()
+            worker.join()
+        if self.outputs:
+            # Switch all outputs off with a single (list form) output call
+            gpio.output(self.outputs, False)
         gpio.cleanup()
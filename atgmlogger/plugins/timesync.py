@@ -13,6 +13,11 @@ from .. import POSIX
 
 __plugin__ = 'TimeSyncDaemon'
 LOG = logging.getLogger(__name__)
+# Difference (in seconds) between UNIX time and GPS time
+# (dt.datetime(1980,1,6) - dt.datetime(1970,1,1)).total_seconds()
+GPS_DELTA = 315964800.0
+GPSWEEK_CF = 604800  # Coefficient to convert GPS weeks to seconds (7*24*60*60)
+MARINE_DATE_FMT = "%Y%m%d%H%M%S"  # Date format of AT1M (Marine) data lines
 
 
 def convert_gps_time(gpsweek: int, gpsweekseconds: float) -> float:
@@ -28,13 +33,9 @@ def convert_gps_time(gpsweek: int, gpsweekseconds: float) -> float:
     -----
     GPS time begins 1980 Jan 6 00:00, UNIX time begins 1970 Jan 1 00:00
 
-    Static values gps_delta and gpsweek_cf are defined by the below functions
+    The module constants GPS_DELTA (time difference between UNIX and GPS time)
+    and GPSWEEK_CF (weeks to seconds coefficient) are pre-computed
     (optimization)
-    gps_delta is the time difference (in seconds) between UNIX time and GPS time
-    gps_delta = (dt.datetime(1980,1,6) - dt.datetime(1970,1,1)).total_seconds()
-
-    gpsweek_cf is the coefficient to convert weeks to seconds
-    gpsweek_cf = 7 * 24 * 60 * 60  # 604800
 
     Attributes
     ----------
@@ -49,16 +50,12 @@ def convert_gps_time(gpsweek: int, gpsweekseconds: float) -> float:
 
     """
     # TODO: Consider UTC/GPS leap seconds?
-    gps_delta = 315964800.0
-    gpsweek_cf = 604800
-
     try:
-        gps_ticks = float(int(gpsweek) * gpsweek_cf) + float(gpsweekseconds)
+        gps_ticks = float(int(gpsweek) * GPSWEEK_CF) + float(gpsweekseconds)
     except TypeError:
         return 0
 
-    timestamp = gps_delta + gps_ticks
-    return timestamp
+    return GPS_DELTA + gps_ticks
 
 
 def timestamp_from_data(line) -> Union[float, None]:
@@ -73,23 +70,26 @@ def timestamp_from_data(line) -> Union[float, None]:
 
     """
     # TODO: Consider using regex for more accurate testing?
-    fields = line.split(',')
-    if len(fields) == 13:
+    # Only the trailing field(s) are required, so count the delimiters and
+    # split off just those fields rather than splitting the entire line.
+    n_fields = line.count(',') + 1
+    if n_fields == 13:
         # Airborne RAW Data w/ GPS Week/GPS Second
-        week = int(fields[11])
-        seconds = float(fields[12])
+        _, week, seconds = line.rsplit(',', 2)
+        week = int(week)
+        seconds = float(seconds)
         if week == 0:
             return None
         return convert_gps_time(week, seconds)
 
-    elif len(fields) == 19:
+    elif n_fields == 19:
         # Marine RAW Data w/ date in last column
         # Format e.g. 20171117202136
         #             YYYYMMDDHHmmss
-        date = str(fields[18])
-        fmt = "%Y%m%d%H%M%S"
+        date = line.rsplit(',', 1)[1]
         try:
-            timestamp = datetime.datetime.strptime(date, fmt).timestamp()
+            timestamp = datetime.datetime.strptime(
+                date, MARINE_DATE_FMT).timestamp()
         except ValueError:
             return None
         else:
@@ -126,9 +126,13 @@ class TimeSyncDaemon(PluginDaemon):
         cls._tick = 0
 
     def _valid_time(self, timestamp):
-        if not self.timetravel and timestamp > time.time():
-            LOG.debug("Timestamp is valid, {ts} > {now}".format(
-                ts=timestamp, now=time.time()))
+        """A timestamp is valid if it is ahead of the system time, or at any
+        (positive) time if timetravel is set, allowing the system time to be
+        set backwards."""
+        now = time.time()
+        if timestamp > 0 and (self.timetravel or timestamp > now):
+            LOG.debug("Timestamp is valid, %s (system time %s)", timestamp,
+                      now)
             return True
         else:
             return False
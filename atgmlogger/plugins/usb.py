@@ -3,22 +3,39 @@
 
 import os
 import re
+import errno
 import sys
 import time
 import uuid
 import shlex
 import shutil
+import fnmatch
 import logging
-import functools
+import tarfile
 import subprocess
 from pathlib import Path
 from typing import List
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from . import PluginDaemon
 
+try:
+    import zstandard
+    HAVE_ZSTD = True
+except ImportError:
+    HAVE_ZSTD = False
+
 __plugin__ = 'RemovableStorageHandler'
 CHECK_PLATFORM = True
 LOG = logging.getLogger(__name__)
+MOUNT_CHECK_INTV = 1.0  # Min seconds between mount checks while unmounted
+COPY_CHUNK = 1024 * 1024  # Max bytes transferred per call when copying files
+COPY_WORKERS = 4  # Number of files copied concurrently to removable storage
+# Translation table deleting characters illegal in directory names
+ILLEGAL_CHARS = str.maketrans('', '', '\\:<>?*/"')
+DIAG_TIMEOUT = 10  # Max seconds to wait for each diagnostic command
+ARCHIVE_NAME = 'logs.tar'  # Archive created on the device if compress is set
+ARCHIVE_LEVEL = {'gz': 6, 'zst': 3}  # Compression level by archive format
 
 
 def get_dest_dir(scheme='date', prefix=None, datefmt='%y%m%d-%H%M'):
@@ -50,60 +67,164 @@ def get_dest_dir(scheme='date', prefix=None, datefmt='%y%m%d-%H%M'):
     if scheme.lower() == 'uuid':
         dir_name = str(uuid.uuid4())
     else:
-        dir_name = time.strftime(datefmt+'UTC', time.gmtime(time.time()))
+        dir_name = time.strftime(datefmt+'UTC', time.gmtime())
     if prefix:
         dir_name = prefix[:5]+dir_name
 
-    illegals = frozenset('\\:<>?*/\"')  # Known illegal characters
-    dir_name = "".join([c for c in dir_name if c not in illegals])
-    return dir_name
+    return dir_name.translate(ILLEGAL_CHARS)
 
 
 def umount(path):
+    """Un-mount the device mounted at path. Returns 0 on success, 1 if the
+    device could not be un-mounted, or -1 if unsupported on this platform."""
     if CHECK_PLATFORM and not sys.platform.startswith('linux'):
         LOG.warning("umount not supported on Windows Platform")
         return -1
     try:
-        result = subprocess.check_output(['/bin/umount', str(path)])
-    except OSError:
-        result = 1
-        LOG.exception("Error occurred attempting to un-mount device: {}"
-                      .format(path))
-    else:
-        LOG.info("Successfully unmounted %s", str(path))
-    return result
+        subprocess.check_output(['/bin/umount', str(path)])
+    except (OSError, subprocess.SubprocessError):
+        LOG.exception("Error occurred attempting to un-mount device: %s",
+                      path)
+        return 1
+    LOG.info("Successfully unmounted %s", str(path))
+    return 0
+
+
+# errno values indicating an in-kernel copy is unsupported for the files
+_NO_KERNEL_COPY = (errno.EINVAL, errno.ENOSYS, errno.ENOTSUP, errno.EXDEV)
+# In-kernel copy functions in order of preference: (os attribute, call) where
+# call copies up to COPY_CHUNK bytes at offset and returns the count copied
+_KERNEL_COPIES = (
+    ('copy_file_range', lambda infd, outfd, offset: os.copy_file_range(
+        infd, outfd, COPY_CHUNK, offset, offset)),
+    ('sendfile', lambda infd, outfd, offset: os.sendfile(
+        outfd, infd, offset, COPY_CHUNK)),
+)
+
+
+def _kernel_copy(copy, infd, outfd):
+    """Copy the contents of infd to outfd using one of the _KERNEL_COPIES
+    calls. Returns False (having copied nothing) if the call is not supported
+    for the descriptors, or copies nothing from a non-empty file (some file
+    systems report success from copy_file_range without copying)."""
+    offset = 0
+    while True:
+        try:
+            copied = copy(infd, outfd, offset)
+        except OSError as err:
+            if offset == 0 and err.errno in _NO_KERNEL_COPY:
+                return False
+            raise
+        if copied == 0:
+            return offset > 0 or os.fstat(infd).st_size == 0
+        offset += copied
+
+
+def _fadvise(fd, advice):
+    """Advise the kernel of the intended access pattern of fd, where
+    os.posix_fadvise is available (advice is the name of the os constant)."""
+    try:
+        os.posix_fadvise(fd, 0, 0, getattr(os, advice))
+    except (AttributeError, OSError):
+        pass
+
+
+def _buffered_copy(fsrc, fdst):
+    """Copy the file object fsrc to fdst through a single reused COPY_CHUNK
+    sized buffer."""
+    buf = bytearray(COPY_CHUNK)
+    with memoryview(buf) as view:
+        while True:
+            count = fsrc.readinto(buf)
+            if not count:
+                break
+            fdst.write(view[:count])
+
+
+def copy_file(src, dst):
+    """
+    Copy the data and permission bits of file src to dst.
+
+    Where available (Linux) data is copied in-kernel, avoiding copying each
+    chunk through user-space buffers: first with os.copy_file_range (Python
+    3.8+), which can share or server-side copy data on file systems that
+    support it, then with os.sendfile. Otherwise it falls back to a
+    read/write copy through a COPY_CHUNK (1 MiB) sized buffer.
+
+    Parameters
+    ----------
+    src, dst : str or Path
+        Source and destination file paths. dst is created or truncated.
+
+    """
+    # src is unbuffered so readinto fills the copy buffer directly; writes
+    # larger than the dst buffer size bypass its buffer.
+    with open(str(src), 'rb', buffering=0) as fsrc, \
+            open(str(dst), 'wb') as fdst:
+        infd, outfd = fsrc.fileno(), fdst.fileno()
+        # Source is read once, sequentially: increase read-ahead, and drop
+        # its pages from the (small) page cache once copied
+        _fadvise(infd, 'POSIX_FADV_SEQUENTIAL')
+        for name, copy in _KERNEL_COPIES:
+            if hasattr(os, name) and _kernel_copy(copy, infd, outfd):
+                break
+        else:
+            _buffered_copy(fsrc, fdst)
+        _fadvise(infd, 'POSIX_FADV_DONTNEED')
+    shutil.copymode(str(src), str(dst))
+
+
+def _diag_output(cmd):
+    """Run diagnostic command cmd, returning its output (bytes)"""
+    try:
+        return subprocess.check_output(shlex.split(cmd), timeout=DIAG_TIMEOUT)
+    except (subprocess.SubprocessError, FileNotFoundError):
+        LOG.exception("Exception executing diagnostic command: %s", cmd)
+        return b"Command Failed, see LOG for exception details."
 
 
 def _runhook(priority=5):
+    """Tag a method as a run hook, executed in order of priority"""
     def inner(func):
-        @functools.wraps(func)
-        def wrapper(self, *args, **kwargs):
-            return func(self, *args, **kwargs)
-        wrapper.runhook = priority
-        return wrapper
+        func.runhook = priority
+        return func
     return inner
 
 
 def _filehook(pattern):
+    """Tag a method as a file hook, executed with the path of a file in the
+    device root matching pattern"""
     def inner(func):
-        @functools.wraps(func)
-        def wrapper(self, *args, **kwargs):
-            return func(self, *args, **kwargs)
-        wrapper.filehook = re.compile(pattern)
-        return wrapper
+        func.filehook = re.compile(pattern)
+        return func
     return inner
 
 
 class RemovableStorageHandler(PluginDaemon):
-    options = {'mountpath': Path, 'logdir': Path, 'patterns': list}
+    options = {'mountpath': Path, 'logdir': Path, 'patterns': list,
+               'compress': bool, 'compression': str}
 
     mountpath = Path('/media/removable')
     logdir = Path('/var/log/atgmlogger')
     patterns = ['*.dat', '*.log', '*.gz', '*.dat.*']
+    compress = False
+    compression = 'gz'  # Archive compression if compress is set: gz or zst
+
+    _next_mount_check = 0
 
     @classmethod
     def condition(cls, *args):
-        return os.path.ismount(str(cls.mountpath))
+        # The Dispatcher evaluates condition for every item it receives, so
+        # rate-limit the mount point stat calls while nothing is mounted.
+        # A positive result is not cached, as the mount is removed when the
+        # handler completes.
+        now = time.monotonic()
+        if now < cls._next_mount_check:
+            return False
+        if os.path.ismount(str(cls.mountpath)):
+            return True
+        cls._next_mount_check = now + MOUNT_CHECK_INTV
+        return False
 
     def __init__(self, **kwargs):
         LOG.debug("Initializing RemovableStorageHandler")
@@ -112,24 +233,38 @@ class RemovableStorageHandler(PluginDaemon):
         self._current_path = None
         self._last_copy_time = None
 
-        self._run_hooks = list()
-        self._file_hooks = list()
-        for member in self.__class__.__dict__.values():
-            # Inspect for decorated methods
-            if hasattr(member, 'runhook'):
-                self._run_hooks.append(self.__getattribute__(member.__name__))
-                LOG.debug("Appending {} to runhooks".format(member))
-            elif hasattr(member, 'filehook'):
-                self._file_hooks.append((member.filehook,
-                                        self.__getattribute__(member.__name__)))
-                LOG.debug("Appending {} to filehooks".format(member))
+        run_hooks, file_hooks = self._get_hooks()
+        self._run_hooks = [getattr(self, name) for name in run_hooks]
+        self._file_hooks = [(pattern, getattr(self, name))
+                            for pattern, name in file_hooks]
+
+    @classmethod
+    def _get_hooks(cls):
+        """Return the names of the run hooks (in order of priority) and the
+        (pattern, name) pairs of the file hooks decorated in this class.
+        The class is only inspected on the first call."""
+        hooks = cls.__dict__.get('_hooks')
+        if hooks is None:
+            members = list(cls.__dict__.values())
+            run_hooks = sorted((member for member in members
+                                if hasattr(member, 'runhook')),
+                               key=lambda member: member.runhook)
+            file_hooks = [member for member in members
+                          if hasattr(member, 'filehook')]
+            for member in run_hooks + file_hooks:
+                LOG.debug("Found hook %s in %s", member.__name__, cls.__name__)
+            hooks = (tuple(member.__name__ for member in run_hooks),
+                     tuple((member.filehook, member.__name__)
+                           for member in file_hooks))
+            cls._hooks = hooks
+        return hooks
 
     # TODO: Figure out best way to allow only one instance of a plugin to run
     def run(self):
         LOG.debug("Starting USB Handler thread")
         if not os.path.ismount(str(self.mountpath)):
-            LOG.error("{path} is not mounted or is not a valid mount point."
-                      .format(path=str(self.mountpath)))
+            LOG.error("%s is not mounted or is not a valid mount point.",
+                      str(self.mountpath))
             return
 
         if not self.logdir.is_dir():
@@ -137,18 +272,19 @@ class RemovableStorageHandler(PluginDaemon):
 
         self.context.blink_until(led='usb')
 
-        for functor in sorted(self._run_hooks, key=lambda x: x.runhook):
+        for functor in self._run_hooks:
             result = functor()
-            LOG.debug("USB Function {} returned: {}"
-                      .format(functor, result))
+            LOG.debug("USB Function %s returned: %s", functor, result)
 
-        try:
-            os.sync()
-        except AttributeError:
-            # os.sync is not available on all platforms (Windows)
-            pass
-        finally:
-            umount(self.mountpath)
+        # Un-mounting writes out the device's dirty pages itself; a global
+        # os.sync (which flushes every file system) is only needed if the
+        # device could not be un-mounted
+        if umount(self.mountpath) != 0:
+            try:
+                os.sync()
+            except AttributeError:
+                # os.sync is not available on all platforms (Windows)
+                pass
         self.context.blink_until(led='usb')
 
         LOG.debug("Returning from USB Handler")
@@ -159,21 +295,24 @@ class RemovableStorageHandler(PluginDaemon):
         file_list = []  # type: List[Path]
         copy_size = 0   # Accumulated size of logs in bytes
 
-        for pattern in self.patterns:
-            file_list.extend(self.logdir.glob(pattern))
+        # Match all patterns in a single pass over the log directory, skipping
+        # hidden files. Note: '(?!)' never matches, for an empty pattern list
+        is_log = re.compile('|'.join(fnmatch.translate(pattern)
+                                     for pattern in self.patterns)
+                            or '(?!)').match
+        for entry in os.scandir(str(self.logdir)):
+            if not entry.name.startswith('.') and is_log(entry.name) and \
+                    entry.is_file():
+                file_list.append(Path(entry.path))
+                copy_size += entry.stat().st_size
 
-        for file in file_list:
-            copy_size += file.stat().st_size
-
-        LOG.info("Total log size to be copied: {} KiB".format(
-            copy_size/1024))
+        LOG.info("Total log size to be copied: %s KiB", copy_size / 1024)
 
         def get_free(path):
             try:
-                statvfs = os.statvfs(str(path.resolve()))
-            except AttributeError:
+                return shutil.disk_usage(str(path)).free
+            except OSError:
                 return -1
-            return statvfs.f_bsize * statvfs.f_bavail
 
         if copy_size > get_free(self.mountpath):
             LOG.warning("Total size of datafiles to be copied is greater "
@@ -185,37 +324,112 @@ class RemovableStorageHandler(PluginDaemon):
         except FileExistsError:
             LOG.warning("Copy Destination Directory already exists.")
 
-        for srcfile in file_list:
-            fname = srcfile.name
-            src_path = str(srcfile.resolve())
-            dest_path = str(dest_dir.joinpath(fname))
+        if self.compress:
+            self._archive_logs(file_list, dest_dir, self.compression)
+            self._current_path = dest_dir
+            self._last_copy_time = time.time()
+            return
 
-            try:
-                shutil.copy(src_path, dest_path)
-                LOG.info("Copied file %s to %s", fname, dest_path)
-            except OSError:
-                LOG.exception("Exception encountered copying log file.")
-                continue
+        # Copy files concurrently, overlapping reads from the log directory
+        # with writes to the device; a failed copy does not affect the others
+        with ThreadPoolExecutor(max_workers=COPY_WORKERS) as executor:
+            futures = {executor.submit(copy_file, srcfile,
+                                       dest_dir.joinpath(srcfile.name)):
+                       srcfile for srcfile in file_list}
+            for future in as_completed(futures):
+                fname = futures[future].name
+                try:
+                    future.result()
+                except OSError:
+                    LOG.exception("Exception encountered copying log file "
+                                  "%s.", fname)
+                else:
+                    LOG.info("Copied file %s to %s", fname,
+                             str(dest_dir.joinpath(fname)))
 
         self._current_path = dest_dir
         self._last_copy_time = time.time()
 
+    @staticmethod
+    def _archive_logs(file_list, dest_dir, compression='gz'):
+        """
+        Stream the files in file_list into a single compressed tar archive in
+        dest_dir. The ASCII logs are highly compressible, so far fewer bytes
+        need to be written to the (slow) removable device.
+
+        Archives are gzip (.tar.gz) compressed, or zstd (.tar.zst) compressed
+        if compression is 'zst' and the optional zstandard module is
+        available, which compresses faster than gzip at a similar ratio.
+
+        """
+        if compression == 'zst' and not HAVE_ZSTD:
+            LOG.warning("zstandard module is unavailable, log archive will "
+                        "be gzip compressed.")
+            compression = 'gz'
+        elif compression not in ARCHIVE_LEVEL:
+            LOG.warning("Unknown log archive compression '%s', log archive "
+                        "will be gzip compressed.", compression)
+            compression = 'gz'
+        archive_path = dest_dir.joinpath(ARCHIVE_NAME + '.' + compression)
+        level = ARCHIVE_LEVEL[compression]
+        try:
+            with archive_path.open('wb') as fd:
+                if compression == 'zst':
+                    compressor = zstandard.ZstdCompressor(level=level,
+                                                          threads=-1)
+                    stream = compressor.stream_writer(fd)
+                    archive = tarfile.open(fileobj=stream, mode='w|')
+                else:
+                    stream = None
+                    archive = tarfile.open(fileobj=fd, mode='w:gz',
+                                           compresslevel=level)
+                with archive:
+                    for srcfile in file_list:
+                        try:
+                            archive.add(str(srcfile), arcname=srcfile.name)
+                        except OSError:
+                            LOG.exception("Exception encountered archiving "
+                                          "log file %s.", srcfile.name)
+                if stream is not None:
+                    # Write the end of the zstd frame
+                    stream.flush(zstandard.FLUSH_FRAME)
+        except (OSError, tarfile.TarError):
+            LOG.exception("Exception encountered creating log archive.")
+        else:
+            LOG.info("Archived %d files to %s", len(file_list),
+                     str(archive_path))
+
     @_runhook(priority=2)
     def watch_files(self, run=True):
         LOG.debug("Processing watch_files")
-        root_files = [file.name for file in self.mountpath.iterdir() if
-                      file.is_file()]
-        files = " ".join(root_files)
-        LOG.debug("Mount path root files: %s", files)
+        # Find the first root file whose whole name matches each hook pattern,
+        # stopping the scan once every pattern has been matched
+        pending = [pattern for pattern, _ in self._file_hooks]
+        found = {}
+        entries = os.scandir(str(self.mountpath))
+        try:
+            for entry in entries:
+                if not pending:
+                    break
+                if not entry.is_file():
+                    continue
+                for pattern in [p for p in pending
+                                if p.fullmatch(entry.name)]:
+                    found[pattern] = entry.name
+                    pending.remove(pattern)
+        finally:
+            # Explicitly closable from Python 3.6
+            getattr(entries, 'close', lambda: None)()
+
         matched = []
         for pattern, runner in self._file_hooks:
             LOG.debug("Looking for pattern: %s", pattern.pattern)
-            match = pattern.search(files)
-            if match:
-                matched.append(match.group())
+            match = found.get(pattern)
+            if match is not None:
+                matched.append(match)
                 LOG.debug("Matched on pattern: %s", pattern.pattern)
                 if run:
-                    path = self.mountpath.joinpath(match.group())
+                    path = self.mountpath.joinpath(match)
                     try:
                         runner(path)
                     except (AttributeError, TypeError):
@@ -252,25 +466,23 @@ class RemovableStorageHandler(PluginDaemon):
                       "runner.")
             return
 
-        dt = time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime(
-            time.time()))
-        result = 'Diagnostic Results ({dt}):\n\n'.format(dt=dt)
+        dt = time.strftime('%Y-%m-%d %H:%M:%S UTC', time.gmtime())
+        result = ['Diagnostic Results ({dt}):\n\n'.format(dt=dt).encode()]
 
         commands = ['uptime', 'vcgencmd measure_temp', 'top -b -n1', 'df -H',
                     'free -h', 'dmesg']
 
-        for cmd in commands:
-            result += 'Command: %s\n' % cmd
-            try:
-                res = subprocess.check_output(shlex.split(cmd)).decode('utf-8')
-            except (subprocess.SubprocessError, FileNotFoundError):
-                LOG.exception("Exception executing diagnostic command: "
-                              "%s", cmd)
-                res = "Command Failed, see LOG for exception details."
-            result += res + '\n\n'
+        # Commands are run concurrently, each bounded by DIAG_TIMEOUT, and
+        # their raw output written to the file in order with a single write
+        with ThreadPoolExecutor(max_workers=len(commands)) as executor:
+            outputs = executor.map(_diag_output, commands)
+            for cmd, res in zip(commands, outputs):
+                result.append(('Command: %s\n' % cmd).encode())
+                result.append(res)
+                result.append(b'\n\n')
 
-        with match.open('w+') as fd:
-            fd.write(result)
+        with match.open('wb') as fd:
+            fd.write(b''.join(result))
 
     @_filehook(r'get(_)?conf(ig)?(\.txt)?')
     def copy_config(self, match):
@@ -281,7 +493,7 @@ class RemovableStorageHandler(PluginDaemon):
 
             with match.open('w+') as fd:
                 fd.write(cfg_data)
-            LOG.info("Writing configuration to {}".format(str(match)))
+            LOG.info("Writing configuration to %s", str(match))
         except (IOError, OSError):
             LOG.exception("Exception writing configuration.")
 
@@ -31,13 +31,17 @@ class _ConfigParams:
 
         if not self._default:
             for cfg in search_paths:  # type: Path
-                if cfg.exists():
-                    with cfg.open('r') as fd:
-                        self.load_config(fd)
-                    if self._default:
-                        LOG.info("Loaded configuration from: %s",
-                                 str(self._path))
-                        break
+                # Attempt the open directly rather than stat-ing first
+                try:
+                    fd = cfg.open('r')
+                except OSError:
+                    continue
+                with fd:
+                    self.load_config(fd)
+                if self._default:
+                    LOG.info("Loaded configuration from: %s",
+                             str(self._path))
+                    break
             else:
                 LOG.warning("No configuration file could be located, "
                             "attempting to load default.")
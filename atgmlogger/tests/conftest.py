@@ -21,8 +21,10 @@ def cfg_dict():
             "parity": "N",
             "stopbits": 1
         },
+        "priority": 0,
         "logging": {
-            "logdir": "/var/log/atgmlogger"
+            "logdir": "/var/log/atgmlogger",
+            "flush_interval": 1.0
         },
         "usb": {
             "mount": "/media/removable",
@@ -38,7 +40,9 @@ def cfg_dict():
             "usb": {
                 "mountpath": "/media/removable",
                 "logdir": "/var/log/atgmlogger",
-                "patterns": ["*.dat", "*.log", "*.gz", "*.dat.*"]
+                "patterns": ["*.dat", "*.log", "*.gz", "*.dat.*"],
+                "compress": False,
+                "compression": "gz"
             },
             "timesync": {
                 "interval": 1000
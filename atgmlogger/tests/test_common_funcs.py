@@ -4,13 +4,17 @@ import copy
 import datetime
 import logging
 import sys
+import threading
+import time
+from argparse import Namespace
+from logging.handlers import QueueHandler
 from pathlib import Path
 
 import pytest
 
 from atgmlogger import atgmlogger
 from atgmlogger.plugins import load_plugin
-from atgmlogger.runconfig import _ConfigParams
+from atgmlogger.runconfig import _ConfigParams, rcParams as _rcParams
 
 _log = logging.getLogger(__name__)
 _log.setLevel(logging.DEBUG)
@@ -36,10 +40,55 @@ def test_decode():
     res = atgmlogger.SerialListener.decode(bad_byte_str)
     assert "Hello World" == res
 
+    res = atgmlogger.SerialListener.decode(b'Hello World\r\n')
+    assert "Hello World" == res
+
     decoded_str = "Hello World"
     res = atgmlogger.SerialListener.decode(decoded_str)
     assert decoded_str == res
 
+    assert atgmlogger.SerialListener.decode(None) is None
+    res = atgmlogger.SerialListener.decode(bytearray(b'\x00Hello\tWorld\x7f'))
+    assert "HelloWorld\x7f" == res
+    # Not decodable, rather than e.g. a run of zero bytes for an int
+    assert atgmlogger.SerialListener.decode(5) is None
+
+
+def test_listener_readlines(handle, monkeypatch):
+    listener = atgmlogger.SerialListener(handle)
+    handle.write(b'Line 1\r\nLine 2\nPartial')
+    lines = listener.readlines()
+    assert [b'Line 1\r', b'Line 2'] == lines
+    assert b'Partial' == listener.buffer
+
+    handle.write(b' Line\n')
+    assert [b'Partial Line'] == listener.readlines()
+    assert b'' == listener.buffer
+
+    # Buffer must be discarded if no line terminator is received within
+    # MAX_BUFFER bytes. Finite timeout ensures readlines can never block.
+    monkeypatch.setattr(atgmlogger, 'MAX_BUFFER', 16)
+    handle.timeout = 0.1
+    handle.write(b'\x00' * 32)
+    assert [] == listener.readlines()
+    assert b'' == listener.buffer
+    handle.write(b'Line 3\n')
+    assert [b'Line 3'] == listener.readlines()
+    assert b'' == listener.buffer
+
+
+def test_listener_exit(handle):
+    listener = atgmlogger.SerialListener(handle)
+    worker = threading.Thread(target=listener, daemon=True)
+    worker.start()
+    handle.write(b'Line 1\n')
+    assert 'Line 1' == listener.collector.get(timeout=1)
+
+    # Listener is blocked on read (no timeout), exit must interrupt it
+    listener.exit()
+    worker.join(timeout=1)
+    assert not worker.is_alive()
+
 
 def test_convert_gps_time():
     gpsweek = 1984
@@ -78,11 +127,33 @@ def test_timestamp_from_data():
     res = timesync.timestamp_from_data(data_sync)
     assert expected == res
 
+    data_airborne = '$UW,81251,2489,4779,4807953,307,874,201,-8919,7232,' \
+                    '211,1984,596080'
+    res = timesync.timestamp_from_data(data_airborne)
+    assert 1516484080.0 == res
+
     data_malformed = '$UW,81251,2489,4779,4807953,307,874,201,-8919,7232'
     res = timesync.timestamp_from_data(data_malformed)
     assert res is None
 
 
+def test_timesync_valid_time(monkeypatch):
+    from atgmlogger.plugins import timesync
+    daemon = timesync.TimeSyncDaemon(data='')
+    now = time.time()
+
+    monkeypatch.setattr(daemon, 'timetravel', False)
+    assert daemon._valid_time(now + 60)
+    assert not daemon._valid_time(now - 60)
+    assert not daemon._valid_time(0)
+
+    # With timetravel the system time may be set backwards
+    monkeypatch.setattr(daemon, 'timetravel', True)
+    assert daemon._valid_time(now + 60)
+    assert daemon._valid_time(now - 60)
+    assert not daemon._valid_time(0)
+
+
 @pytest.mark.skip("Broken due to refactoring of parse_args into __main__.py")
 def test_parse_args():
     from atgmlogger.runconfig import rcParams
@@ -156,3 +227,94 @@ def test_config_notexist(cfg_dict):
     cfg = _ConfigParams(config=cfg_dict)
 
     assert cfg['badkey.badbranch'] is None
+
+
+@pytest.fixture
+def applog_dir(tmpdir):
+    logdir = Path(str(tmpdir.mkdir('applog')))
+    orig_dir = _rcParams['logging.logdir']
+    applog = logging.getLogger('atgmlogger')
+    orig_level = applog.level
+    _rcParams['logging.logdir'] = str(logdir)
+    applog.setLevel(logging.INFO)
+    yield logdir
+    _rcParams['logging.logdir'] = orig_dir
+    applog.setLevel(orig_level)
+
+
+class MockDispatcher:
+    def start(self):
+        pass
+
+    def log_rotate(self):
+        pass
+
+
+def test_applog_written_on_exit(applog_dir):
+    args = Namespace(trace=False, verbose=1)
+    res = atgmlogger.atgmlogger(args, listener=lambda: None,
+                                dispatcher=MockDispatcher())
+    assert 0 == res
+    assert not any(isinstance(hdlr, QueueHandler)
+                   for hdlr in atgmlogger.LOG.handlers)
+
+    with applog_dir.joinpath('application.log').open('r') as fd:
+        assert "ATGMLogger started" in fd.read()
+
+
+def test_applog_written_on_init_failure(applog_dir, monkeypatch):
+    def bad_handle():
+        raise OSError("Serial port could not be opened")
+
+    monkeypatch.setattr(atgmlogger, '_get_handle', bad_handle)
+    args = Namespace(trace=False, verbose=1)
+    with pytest.raises(OSError):
+        atgmlogger.atgmlogger(args)
+    assert not any(isinstance(hdlr, QueueHandler)
+                   for hdlr in atgmlogger.LOG.handlers)
+
+    with applog_dir.joinpath('application.log').open('r') as fd:
+        assert "Serial port could not be opened" in fd.read()
+
+
+def test_cached_time_formatter(monkeypatch):
+    from atgmlogger import CachedTimeFormatter, DATE_FMT
+    formatter = CachedTimeFormatter('%(asctime)s %(message)s',
+                                    datefmt=DATE_FMT)
+    record = logging.makeLogRecord({'msg': 'first', 'created': 1500000000.1})
+    expected = logging.Formatter(datefmt=DATE_FMT).formatTime(record, DATE_FMT)
+    assert expected + ' first' == formatter.format(record)
+
+    calls = []
+    monkeypatch.setattr(formatter, 'converter',
+                        lambda t: calls.append(t) or time.localtime(t))
+    same_sec = logging.makeLogRecord({'msg': 'second',
+                                      'created': 1500000000.9})
+    assert expected + ' second' == formatter.format(same_sec)
+    assert not calls
+
+    next_sec = logging.makeLogRecord({'msg': 'third', 'created': 1500000001.0})
+    assert expected != formatter.formatTime(next_sec, DATE_FMT)
+    assert 1 == len(calls)
+
+
+def test_cached_time_formatter_no_datefmt():
+    from atgmlogger import CachedTimeFormatter
+    formatter = CachedTimeFormatter('%(asctime)s %(message)s')
+    first = logging.makeLogRecord({'msg': 'first', 'created': 1500000000.25,
+                                   'msecs': 250})
+    second = logging.makeLogRecord({'msg': 'second', 'created': 1500000000.75,
+                                    'msecs': 750})
+    assert formatter.formatTime(first).endswith(',250')
+    # Default format includes msecs, so records in the same second differ
+    assert formatter.formatTime(second).endswith(',750')
+
+
+def test_set_priority_unpermitted(monkeypatch, caplog):
+    def sched_setscheduler(pid, policy, param):
+        raise PermissionError(1, 'Operation not permitted')
+
+    monkeypatch.setattr(atgmlogger.os, 'sched_setscheduler',
+                        sched_setscheduler, raising=False)
+    atgmlogger._set_priority(10)
+    assert 'Unable to set real-time priority' in caplog.text
@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
 
+import time
+import logging
 from pathlib import Path
 
-from atgmlogger.logger import DataLogger
+from atgmlogger.logger import DataLogger, MAX_BUFFER
 
 LINE = "$UW,81242,-1948,557,4807924,307,872,204,6978,7541,-70,305,266," \
        "4903912,0.000000,0.000000,0.0000,0.0000,{idx}"
@@ -40,3 +42,138 @@ def test_simple_logger(tmpdir):
     with log_file.open('r') as fd:
         for i, line in enumerate(fd):
             assert accumulator[i] == line.strip()
+
+
+def test_logger_timed_flush(tmpdir):
+    test_dir = Path(str(tmpdir.mkdir('logs')))
+    log_file = test_dir.joinpath('gravdata.dat')
+
+    logger = DataLogger()
+    logger.set_context(MockAppContext())
+    logger.configure(logfile=log_file, flush_interval=0.05)
+
+    logger.start()
+    for i in range(10):
+        logger.put(LINE.format(idx=i))
+    logger.queue.join()
+
+    # Data should reach the file after flush_interval without closing handle
+    lines = []
+    deadline = time.monotonic() + 5
+    while len(lines) < 10 and time.monotonic() < deadline:
+        if log_file.exists():
+            with log_file.open('r') as fd:
+                lines = fd.readlines()
+        time.sleep(0.01)
+    assert 10 == len(lines)
+
+    logger.exit(join=True)
+    assert not logger.is_alive()
+
+
+def test_logger_appends(tmpdir):
+    test_dir = Path(str(tmpdir.mkdir('logs')))
+    log_file = test_dir.joinpath('gravdata.dat')
+    with log_file.open('w') as fd:
+        fd.write(LINE.format(idx='existing') + '\n')
+
+    logger = DataLogger()
+    logger.set_context(MockAppContext())
+    logger.configure(logfile=log_file)
+    logger.start()
+    logger.put(LINE.format(idx=0))
+    logger.exit(join=True)
+
+    with log_file.open('r') as fd:
+        lines = [line.strip() for line in fd]
+    assert [LINE.format(idx='existing'), LINE.format(idx=0)] == lines
+
+
+def test_logger_lazy_open(tmpdir):
+    test_dir = Path(str(tmpdir.mkdir('logs')))
+    log_file = test_dir.joinpath('gravdata.dat')
+
+    logger = DataLogger()
+    logger.set_context(MockAppContext())
+    logger.configure(logfile=log_file)
+    logger.start()
+    logger.exit(join=True)
+
+    # Idle logger blocks without a timeout, exit() must still wake it
+    assert not logger.is_alive()
+    assert not log_file.exists()
+
+
+def test_logger_blink_subsampled(tmpdir):
+    test_dir = Path(str(tmpdir.mkdir('logs')))
+
+    class CountingContext:
+        blinks = 0
+
+        def blink(self, *args, **kwargs):
+            self.blinks += 1
+
+    context = CountingContext()
+    logger = DataLogger()
+    logger.set_context(context)
+    logger.configure(logfile=test_dir.joinpath('gravdata.dat'))
+    logger.start()
+    for i in range(1000):
+        logger.put(LINE.format(idx=i))
+    logger.exit(join=True)
+
+    # 1000 lines are processed well within one blink interval
+    assert 1 <= context.blinks < 10
+
+
+def test_logger_buffer_limited(tmpdir, caplog):
+    # Parent directory does not exist, so the data file cannot be opened
+    log_file = Path(str(tmpdir)).joinpath('missing', 'gravdata.dat')
+
+    logger = DataLogger()
+    logger.set_context(MockAppContext())
+    logger.configure(logfile=log_file)
+    logger.start()
+    for i in range(10000):
+        logger.put(LINE.format(idx=i))
+    logger.queue.join()
+
+    assert len(logger._buffer) <= MAX_BUFFER
+    # Only whole lines are retained, ending with the most recent
+    assert logger._buffer.startswith(b'$UW')
+    assert logger._buffer.endswith(LINE.format(idx=9999).encode() + b'\n')
+
+    logger.exit(join=True)
+    assert not logger.is_alive()
+    warnings = [rec for rec in caplog.records
+                if rec.name == 'atgmlogger.logger'
+                and rec.levelno >= logging.WARNING]
+    # One error for the write failure, one warning for discarding data,
+    # plus the final flush at exit
+    assert 3 == len(warnings)
+
+
+def test_logger_open_backoff(tmpdir, caplog, monkeypatch):
+    log_file = Path(str(tmpdir)).joinpath('missing', 'gravdata.dat')
+    opens = []
+    _get_fhandle = DataLogger._get_fhandle
+
+    def counting_open(self):
+        opens.append(1)
+        _get_fhandle(self)
+    monkeypatch.setattr(DataLogger, '_get_fhandle', counting_open)
+
+    logger = DataLogger()
+    logger.set_context(MockAppContext())
+    logger.configure(logfile=log_file, flush_interval=60)
+    logger.start()
+    for i in range(10000):
+        logger.put(LINE.format(idx=i))
+    logger.queue.join()
+
+    # Open is not retried for each line once it has failed
+    assert 1 == len(opens)
+    errors = [rec for rec in caplog.records
+              if rec.getMessage() == "Error opening file for writing."]
+    assert 1 == len(errors)
+    logger.exit(join=True)
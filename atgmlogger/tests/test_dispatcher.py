@@ -124,3 +124,32 @@ def test_oneshot_plugin(dispatcher):
     #
     # dispatcher.exit(join=True)
     # assert not dispatcher.is_alive()
+
+
+def test_plugin_exit_join_bounded(monkeypatch):
+    import time
+    import atgmlogger.plugins as _plugins
+    monkeypatch.setattr(_plugins, 'JOIN_TIMEOUT', 0.1)
+    release = threading.Event()
+
+    class StuckPlugin(PluginInterface):
+        @staticmethod
+        def consumer_type():
+            return {str}
+
+        def run(self):
+            # Never marks the queued item done until released
+            release.wait()
+
+    plugin = StuckPlugin()
+    plugin.start()
+    plugin.put('item')
+
+    start = time.monotonic()
+    plugin.exit(join=True)
+    assert time.monotonic() - start < 2
+    assert plugin.is_alive()
+
+    release.set()
+    plugin.join(timeout=1)
+    assert not plugin.is_alive()
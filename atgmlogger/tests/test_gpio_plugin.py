@@ -0,0 +1,105 @@
+# -*- coding: utf-8 -*-
+
+import time
+
+import pytest
+
+from atgmlogger.dispatcher import Blink
+
+
+class StubGPIO:
+    """Minimal stand-in for RPi.GPIO recording each output call"""
+    BOARD = 10
+    BCM = 11
+    OUT = 0
+
+    def __init__(self):
+        self.outputs = []
+
+    def setwarnings(self, flag):
+        pass
+
+    def setmode(self, mode):
+        pass
+
+    def setup(self, pin, direction):
+        pass
+
+    def output(self, pin, state):
+        self.outputs.append((pin, state))
+
+    def cleanup(self):
+        pass
+
+    def count(self, pin):
+        return sum(1 for out_pin, state in self.outputs
+                   if out_pin == pin and state)
+
+
+def _wait_for(predicate, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not predicate() and time.monotonic() < deadline:
+        time.sleep(0.005)
+    return predicate()
+
+
+@pytest.fixture
+def stub_gpio(monkeypatch):
+    import atgmlogger.plugins.gpio as _gpio
+    stub = StubGPIO()
+    monkeypatch.setattr(_gpio, 'HAVE_GPIO', True)
+    monkeypatch.setattr(_gpio, 'gpio', stub, raising=False)
+    return stub
+
+
+@pytest.fixture
+def listener(stub_gpio):
+    from atgmlogger.plugins.gpio import GPIOListener
+    inst = GPIOListener()
+    inst.configure(mode='board', data_pin=11, usb_pin=13, freq=0.005)
+    yield inst
+    if inst.is_alive():
+        inst.exit()
+
+
+def test_gpio_stop_one_continuous_blink(listener, stub_gpio):
+    listener.start()
+    listener.put(Blink('data', continuous=True))
+    listener.put(Blink('usb', continuous=True))
+    assert _wait_for(lambda: stub_gpio.count(11) and stub_gpio.count(13))
+
+    # Stopping the data LED leaves the usb LED blinking
+    listener.put(Blink('data', continuous=True))
+    listener.queue.join()
+    data_count, usb_count = stub_gpio.count(11), stub_gpio.count(13)
+    assert _wait_for(lambda: stub_gpio.count(13) > usb_count + 2)
+    assert data_count == stub_gpio.count(11)
+
+    listener.exit(join=True)
+    assert not listener.is_alive()
+    # All outputs are switched off on exit
+    assert ([11, 13], False) == stub_gpio.outputs[-1]
+
+
+def test_gpio_continuous_never_dropped(listener):
+    from atgmlogger.plugins.gpio import MAX_PENDING
+    # Listener is not started, so the queue fills
+    for _ in range(MAX_PENDING + 5):
+        listener.put(Blink('data'))
+    assert MAX_PENDING == listener.queue.qsize()
+
+    listener.put(Blink('usb', continuous=True))
+    listener.put(Blink('usb', continuous=True))
+    assert MAX_PENDING + 2 == listener.queue.qsize()
+
+
+def test_gpio_exit_interrupts_blink(listener, stub_gpio):
+    listener.configure(freq=30)
+    listener.start()
+    listener.put(Blink('data'))
+    assert _wait_for(lambda: stub_gpio.count(11))
+
+    start = time.monotonic()
+    listener.exit()
+    assert not listener.is_alive()
+    assert time.monotonic() - start < 5
@@ -0,0 +1,57 @@
+# -*- coding: utf-8 -*-
+
+import importlib.util
+from pathlib import Path
+
+import pytest
+
+_path = Path(__file__).parents[2].joinpath('tools', 'send.py')
+_spec = importlib.util.spec_from_file_location('send', str(_path))
+send = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(send)
+
+
+class MockHandle:
+    def __init__(self):
+        self.lines = []
+
+    def write(self, data):
+        self.lines.append(data)
+
+
+@pytest.fixture(autouse=True)
+def reset_count(monkeypatch):
+    monkeypatch.setattr(send, 'SEND_COUNT', 0)
+
+
+def test_mapped_lines(tmpdir):
+    path = Path(str(tmpdir)).joinpath('data.txt')
+    path.write_bytes(b'line0\nline1\nline2')
+
+    lines = send.MappedLines(path)
+    # Trailing line without a terminator is still returned
+    assert 3 == len(lines)
+    assert [b'line0\n', b'line1\n', b'line2'] == list(lines)
+    assert b'line2' == lines[-1]
+    assert b'line1\n' == lines[-2]
+    assert b'line0\n' == lines[0]
+    lines.close()
+
+
+def test_send_count():
+    hdl = MockHandle()
+    assert 5 == send.send(hdl, ['a\n', b'b\n'], interval=0, count=5,
+                          repeat=True)
+    assert [b'a\n', b'b\n', b'a\n', b'b\n', b'a\n'] == hdl.lines
+
+
+def test_send_exhausted():
+    hdl = MockHandle()
+    assert 2 == send.send(hdl, ['a\n', 'b\n'], interval=0, count=5)
+    assert [b'a\n', b'b\n'] == hdl.lines
+
+
+def test_send_repeat_empty():
+    hdl = MockHandle()
+    assert 0 == send.send(hdl, [], interval=0, repeat=True)
+    assert [] == hdl.lines
@@ -49,3 +49,195 @@ def test_usb_watchfiles(usb_plugin, mountpoint: Path):
     # with open(mountpoint.joinpath('diag.txt'), 'r') as fd:
     #     print("Test Diag Result:")
     #     print(fd.read())
+
+
+def test_usb_watchfiles_whole_names(usb_plugin, mountpoint: Path):
+    usb_plugin.configure(mountpath=mountpoint)
+    for name in ['unclear.txt', 'diag', 'diagnostics.txt.bak']:
+        mountpoint.joinpath(name).write_text('null')
+    mountpoint.joinpath('clear.txt').mkdir()
+
+    inst = usb_plugin()
+    assert ['diag'] == inst.watch_files(run=False)
+
+
+def test_usb_condition_rate_limited(usb_plugin, mountpoint, monkeypatch):
+    import atgmlogger.plugins.usb as _usb
+    calls = []
+
+    def ismount(path):
+        calls.append(path)
+        return mounted
+
+    monkeypatch.setattr(_usb.os.path, 'ismount', ismount)
+    monkeypatch.setattr(usb_plugin, '_next_mount_check', 0)
+    usb_plugin.configure(mountpath=mountpoint)
+
+    mounted = False
+    assert not usb_plugin.condition('data')
+    assert not usb_plugin.condition('data')
+    assert 1 == len(calls)
+
+    # Mount becomes available; detected once the check interval elapses
+    mounted = True
+    monkeypatch.setattr(usb_plugin, '_next_mount_check', 0)
+    assert usb_plugin.condition('data')
+    assert usb_plugin.condition('data')
+    assert 3 == len(calls)
+
+
+@pytest.mark.parametrize('unsupported', [(), ('copy_file_range',),
+                                         ('copy_file_range', 'sendfile')])
+def test_copy_file(tmpdir, monkeypatch, unsupported):
+    import errno
+    import os
+    import atgmlogger.plugins.usb as _usb
+
+    def unsupported_call(*args):
+        raise OSError(errno.EXDEV, 'Invalid cross-device link')
+    for name in unsupported:
+        monkeypatch.setattr(_usb.os, name, unsupported_call, raising=False)
+    monkeypatch.setattr(_usb, 'COPY_CHUNK', 1000)
+
+    src = Path(str(tmpdir.join('gravdata.dat')))
+    dst = Path(str(tmpdir.join('copy.dat')))
+    data = os.urandom(4500)
+    src.write_bytes(data)
+    dst.write_bytes(b'stale data longer than nothing' * 1000)
+
+    _usb.copy_file(src, dst)
+    assert data == dst.read_bytes()
+
+
+def test_copy_file_noop_kernel_copy(tmpdir, monkeypatch):
+    import os
+    import atgmlogger.plugins.usb as _usb
+
+    # copy_file_range reporting EOF without copying falls through to sendfile
+    monkeypatch.setattr(_usb.os, 'copy_file_range', lambda *args: 0,
+                        raising=False)
+    src = Path(str(tmpdir.join('gravdata.dat')))
+    dst = Path(str(tmpdir.join('copy.dat')))
+    data = os.urandom(4500)
+    src.write_bytes(data)
+
+    _usb.copy_file(src, dst)
+    assert data == dst.read_bytes()
+
+    empty = Path(str(tmpdir.join('empty.dat')))
+    empty.write_bytes(b'')
+    _usb.copy_file(empty, dst)
+    assert b'' == dst.read_bytes()
+
+
+@pytest.fixture
+def logfiles(tmpdir):
+    logdir = Path(str(tmpdir.mkdir('logs')))
+    files = {'gravdata.dat': b'data\n' * 100, 'application.log': b'log\n',
+             'gravdata.dat.1': b'old\n' * 10, 'ignored.txt': b'ignored'}
+    for name, content in files.items():
+        logdir.joinpath(name).write_bytes(content)
+    del files['ignored.txt']
+    return logdir, files
+
+
+def test_usb_copy_logs(usb_plugin, mountpoint, logfiles):
+    logdir, files = logfiles
+    usb_plugin.configure(mountpath=mountpoint, logdir=logdir,
+                         patterns=['*.dat', '*.log', '*.dat.*'],
+                         compress=False)
+
+    inst = usb_plugin()
+    inst.copy_logs()
+
+    dest_dir = inst._current_path
+    assert mountpoint.resolve() == dest_dir.parent
+    copied = {file.name: file.read_bytes() for file in dest_dir.iterdir()}
+    assert files == copied
+
+
+@pytest.mark.parametrize('compression', ['gz', 'zst', 'bz2'])
+def test_usb_copy_logs_compressed(usb_plugin, mountpoint, logfiles,
+                                  monkeypatch, compression):
+    import tarfile
+    import atgmlogger.plugins.usb as _usb
+    # zstd falls back to gzip if the optional zstandard module is unavailable,
+    # as do unknown compression types
+    monkeypatch.setattr(_usb, 'HAVE_ZSTD', False)
+    logdir, files = logfiles
+    usb_plugin.configure(mountpath=mountpoint, logdir=logdir,
+                         patterns=['*.dat', '*.log', '*.dat.*'],
+                         compress=True, compression=compression)
+
+    inst = usb_plugin()
+    inst.copy_logs()
+    usb_plugin.configure(compress=False, compression='gz')
+
+    dest_dir = inst._current_path
+    assert ['logs.tar.gz'] == [file.name for file in dest_dir.iterdir()]
+    with tarfile.open(str(dest_dir.joinpath('logs.tar.gz')), 'r:gz') as tf:
+        archived = {member.name: tf.extractfile(member).read()
+                    for member in tf.getmembers()}
+    assert files == archived
+
+
+def test_usb_copy_logs_zstd(usb_plugin, mountpoint, logfiles, monkeypatch):
+    import tarfile
+    import atgmlogger.plugins.usb as _usb
+    zstandard = pytest.importorskip('zstandard')
+    monkeypatch.setattr(_usb, 'HAVE_ZSTD', True)
+    monkeypatch.setattr(_usb, 'zstandard', zstandard, raising=False)
+    logdir, files = logfiles
+    usb_plugin.configure(mountpath=mountpoint, logdir=logdir,
+                         patterns=['*.dat', '*.log', '*.dat.*'],
+                         compress=True, compression='zst')
+
+    inst = usb_plugin()
+    inst.copy_logs()
+    usb_plugin.configure(compress=False, compression='gz')
+
+    dest_dir = inst._current_path
+    assert ['logs.tar.zst'] == [file.name for file in dest_dir.iterdir()]
+    with dest_dir.joinpath('logs.tar.zst').open('rb') as fd:
+        reader = zstandard.ZstdDecompressor().stream_reader(fd)
+        with tarfile.open(fileobj=reader, mode='r|') as tf:
+            archived = {member.name: tf.extractfile(member).read()
+                        for member in tf}
+    assert files == archived
+
+
+def test_usb_run_diag(usb_plugin, mountpoint, monkeypatch):
+    import subprocess
+    import atgmlogger.plugins.usb as _usb
+
+    def check_output(args, timeout=None):
+        if args[0] == 'dmesg':
+            raise subprocess.CalledProcessError(1, args)
+        if args[0] == 'top':
+            raise subprocess.TimeoutExpired(args, timeout)
+        # Output is not required to be valid utf-8
+        return ' '.join(args).encode() + b' output \xff'
+
+    monkeypatch.setattr(_usb, 'CHECK_PLATFORM', False)
+    monkeypatch.setattr(_usb.subprocess, 'check_output', check_output)
+    diag_file = mountpoint.joinpath('diag.txt')
+    diag_file.write_text('null')
+
+    inst = usb_plugin()
+    inst.run_diag(diag_file)
+
+    result = diag_file.read_bytes()
+    assert result.startswith(b'Diagnostic Results (')
+    assert b'Command: df -H\ndf -H output \xff\n\n' in result
+    assert b'Command: dmesg\nCommand Failed' in result
+    assert b'Command: top -b -n1\nCommand Failed' in result
+    # Output is in command order, regardless of completion order
+    assert result.index(b'Command: uptime') < result.index(b'Command: dmesg')
+
+
+def test_get_dest_dir():
+    from atgmlogger.plugins.usb import get_dest_dir
+    dir_name = get_dest_dir(prefix='a:b/c', datefmt='%y<>?*"\\')
+    assert dir_name.startswith('abc')
+    assert dir_name.endswith('UTC')
+    assert not set('\\:<>?*/"') & set(dir_name)
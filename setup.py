@@ -25,6 +25,9 @@ setup(
     description="Serial Data Recording Utility for Linux/RaspberryPi devices.",
     long_description=__description__,
     install_requires=requirements,
+    extras_require={
+        'zstd': ['zstandard']
+    },
     python_requires='>=3.5.*',
     include_package_data=True,
     zip_safe=True,
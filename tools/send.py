@@ -3,6 +3,8 @@
 import functools
 import time
 import sys
+import mmap
+import array
 import logging
 import itertools
 import argparse
@@ -25,6 +27,58 @@ SEND_COUNT = 0
 atgmlogger functionality."""
 
 
+class MappedLines:
+    """Read-only, memory-mapped sequence of the lines in a file.
+
+    The file is indexed once on load (a single scan for newline offsets);
+    lines are then returned as bytes (including line terminator) sliced from
+    the mapping, rather than materializing a str object for every line of the
+    file up front.
+
+    Parameters
+    ----------
+    path : str or Path
+        Path of a non-empty file to map.
+
+    """
+    def __init__(self, path):
+        with open(str(path), 'rb') as fd:
+            self._mm = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        self._ends = array.array('Q')
+
+        find = self._mm.find
+        pos = 0
+        while True:
+            i = find(b'\n', pos)
+            if i < 0:
+                break
+            pos = i + 1
+            self._ends.append(pos)
+        if pos < len(self._mm):
+            # Final line without a terminator
+            self._ends.append(len(self._mm))
+
+    def __len__(self):
+        return len(self._ends)
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self._ends)
+        end = self._ends[index]
+        start = self._ends[index - 1] if index else 0
+        return self._mm[start:end]
+
+    def __iter__(self):
+        mm = self._mm
+        start = 0
+        for end in self._ends:
+            yield mm[start:end]
+            start = end
+
+    def close(self):
+        self._mm.close()
+
+
 def get_at1_handle(device=None, read_timeout=1):
     """Open a serial handle with parameter set to emulate AT1 Gravity Meter
     serial data flow.
@@ -57,10 +111,14 @@ def send(handle, data: List, interval=1.0, count=None,
     Parameters
     ----------
     handle :
-        Serial or function handle with callable attribute write(str)
-    data
+        Serial or function handle with callable attribute write(bytes)
+    data : Sequence
+        Sequence of lines (str or bytes) to send. Must be re-iterable if
+        repeat is True.
     interval : float, Optional
-        Specify interval to sleep between sending data line, default 1.0 seconds
+        Specify interval between sending each data line, default 1.0 seconds.
+        Lines are paced against a monotonic deadline, so time spent writing
+        does not accumulate as drift in the send rate.
     count : int
         If int specified, send lines until count is reached
     repeat : bool, Optional
@@ -75,25 +133,34 @@ def send(handle, data: List, interval=1.0, count=None,
     int : status code
 
     """
+    if not isinstance(data, MappedLines):
+        # Encode once up front, rather than on every send of a (repeated) line
+        data = [line if isinstance(line, bytes)
+                else line.encode(ENCODING, errors='ignore') for line in data]
+
+    global SEND_COUNT
+    if not len(data):
+        _log.info("Data source exhausted, {} lines sent.".format(SEND_COUNT))
+        return SEND_COUNT
+
     if repeat:
-        data = itertools.cycle(data)
+        # Unlike itertools.cycle, this does not keep a copy of every line
+        data = itertools.chain.from_iterable(itertools.repeat(data))
     else:
-        # Convert list to generator (allows use of next())
-        data = (line for line in data)
+        data = iter(data)
 
-    global SEND_COUNT
+    deadline = time.monotonic()
     while True:
-        if count is not None and count >= SEND_COUNT:
+        if count is not None and SEND_COUNT >= count:
             _log.info("Send Count reached, exiting main loop.")
             break
 
         try:
-            line = next(data)  # type: str
+            line = next(data)  # type: bytes
         except StopIteration:
             _log.info("Data source exhausted, {} lines sent.".format(SEND_COUNT))
             break
-        enc_line = line.encode(ENCODING, errors='ignore')
-        handle.write(enc_line)
+        handle.write(line)
         if copy_output is not None:
             try:
                 copy_output(line)
@@ -102,7 +169,10 @@ def send(handle, data: List, interval=1.0, count=None,
         SEND_COUNT += 1
         if SEND_COUNT % 100 == 0:
             _log.debug("Sent line %d", SEND_COUNT)
-        time.sleep(interval)
+        deadline += interval
+        delay = deadline - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
 
     return SEND_COUNT
 
@@ -137,18 +207,16 @@ if __name__ == '__main__':
                    .format(str(path)))
         sys.exit(1)
 
-    contents = None
-    with path.open('r') as fd:
-        contents = fd.readlines()
-    if not len(contents):
+    if not path.stat().st_size:
         _log.error("Input file contains no data.")
         sys.exit(1)
+    contents = MappedLines(path)
 
     tee = None
     copy = lambda x: None
     if opts.tee is not None:
         try:
-            tee = open(opts.tee, 'w', buffering=1)
+            tee = open(opts.tee, 'wb')
             copy = functools.partial(_write_tee, tee)
         except IOError:
             pass
@@ -166,6 +234,7 @@ if __name__ == '__main__':
         if tee is not None:
             tee.flush()
             tee.close()
+        contents.close()
         sys.exit(1)
     else:
         _log.info("Send completed.\n"
@@ -173,4 +242,5 @@ if __name__ == '__main__':
         if tee is not None:
             tee.flush()
             tee.close()
+        contents.close()
         sys.exit(0)